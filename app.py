@@ -1,7 +1,11 @@
 import os
 import io
-import traceback
-from datetime import datetime
+import re
+import csv
+import functools
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 
 from flask import (
     Flask,
@@ -14,6 +18,29 @@ from flask import (
     abort,
 )
 import pandas as pd
+import xlsxwriter
+
+from converters.base import convert_vectorized
+
+# Optional fast readers: pyarrow for CSV, python-calamine for Excel
+try:
+    import pyarrow as pa
+    from pyarrow import csv as pa_csv
+except ImportError:
+    pa = pa_csv = None
+
+# Optional polars engine, switched on with CONVERTER_ENGINE=polars
+try:
+    import polars as pl
+except ImportError:
+    pl = None
+
+try:
+    import python_calamine  # noqa: F401
+
+    EXCEL_ENGINE = "calamine"
+except ImportError:
+    EXCEL_ENGINE = None
 
 # ---------------------------
 # Configuration
@@ -32,11 +59,25 @@ ALLOWED_MIMES = {
 app = Flask(__name__)
 app.secret_key = os.environ.get("FLASK_SECRET", "dev-secret-key")
 app.config["MAX_CONTENT_LENGTH"] = 64 * 1024 * 1024  # 64 MB uploads
+CSV_CHUNK_ROWS = 50_000  # rows converted per CSV chunk
+CSV_BLOCK_SIZE = 8 * 1024 * 1024  # bytes per pyarrow CSV block
+OUTPUT_SPOOL_SIZE = 16 * 1024 * 1024  # output kept in memory up to 16 MB
+MAX_UPLOAD_WORKERS = 8  # files converted concurrently per request
+CONVERTER_ENGINE = os.environ.get("CONVERTER_ENGINE", "pandas").lower()
+# pd.read_csv options for a plain CSV read (used when pyarrow is missing)
+CSV_READ_OPTS = {"engine": "c", "encoding": "utf-8"}
+# pd.read_csv options tried in order when the first read of an upload fails
+CSV_FALLBACKS = [
+    CSV_READ_OPTS,
+    {"engine": "c", "encoding": "latin-1"},
+    {"engine": "python", "encoding": "latin-1", "sep": None},  # sniff separator
+]
 
 
 # ---------------------------
 # Dynamic import helpers
 # ---------------------------
+@functools.lru_cache(maxsize=None)
 def import_parser(module_name: str):
     """
     Try to import converters.<module_name>.convert
@@ -65,124 +106,204 @@ PARSERS = {
 
 
 # If generic parser missing, we'll use an inline fallback converter defined below.
+# Heuristic source columns for each logical field, tried left to right.
+INLINE_SCHEMA = {
+    "voucher_no": ["invoice id", "order id", "id"],
+    "voucher_date": ["invoice date", "order date", "date"],
+    "buyer_state": ["shipping state", "state", "ship state"],
+    "buyer_name": ["buyer name", "customer name"],
+    "gst_number": ["buyer gstin", "gstin", "gst number", "gst no"],
+    "item": ["product title", "item name", "product"],
+    "hsn": ["hsn", "hsn code"],
+    "qty": ["quantity", "qty"],
+    "rate": ["unit price", "price", "rate"],
+    "amount": ["taxable value", "amount", "item value"],
+    "tax": ["tax amount", "tax", "gst amount"],
+}
+
+
 def inline_generic_convert(df: pd.DataFrame, seller_state: str):
     """
     Minimal generic converter used if converters.generic isn't present.
     It attempts to map common columns to the Tally schema using heuristics.
     """
-    from converters.base import TALLY_COLUMNS, parse_date, apply_gst_split
-
-    # lower and strip column names
-    colmap = {c: c.strip().lower() for c in df.columns}
-    df = df.rename(columns=colmap)
-    rows = []
-
-    for idx, row in df.iterrows():
-        # heuristics for common columns
-        voucher_no = (
-            row.get("invoice id") or row.get("order id") or row.get("id") or f"R{idx+1}"
-        )
-        voucher_date = parse_date(
-            row.get("invoice date") or row.get("order date") or row.get("date") or ""
-        )
-        buyer_state = (
-            row.get("shipping state") or row.get("state") or row.get("ship state") or ""
-        )
-        buyer_name = (
-            row.get("buyer name") or row.get("customer name") or f"Sale via Marketplace"
-        )
-        is_b2b = bool(
-            row.get("buyer gstin")
-            or row.get("gstin")
-            or row.get("gst number")
-            or row.get("gst no")
-        )
-        gst_type = "Registered" if is_b2b else "Unregistered"
-        gst_number = (
-            row.get("buyer gstin") or row.get("gstin") or row.get("gst number") or ""
-        )
-
-        item_name = (
-            row.get("product title")
-            or row.get("item name")
-            or row.get("product")
-            or "Item"
-        )
-        hsn = row.get("hsn") or row.get("hsn code") or ""
-        qty = row.get("quantity") or row.get("qty") or 1
-        try:
-            qty = float(qty)
-        except Exception:
-            qty = 1.0
-        rate = row.get("unit price") or row.get("price") or row.get("rate") or ""
+    return convert_vectorized(
+        df, seller_state, INLINE_SCHEMA, "R", "Sale via Marketplace"
+    )
+
+
+# Filename hint -> (parser, source tag); first match wins, else generic
+ROUTER = [
+    (re.compile(r"amazon", re.I), PARSERS["amazon"], "Amazon"),
+    (re.compile(r"flipkart", re.I), PARSERS["flipkart"], "Flipkart"),
+    (re.compile(r"meesho", re.I), PARSERS["meesho"], "Meesho"),
+    (re.compile(r"tcs", re.I), PARSERS["tcs"], "TCS"),
+]
+
+
+def route_parser(filename: str):
+    """Return (parser_fn, source_tag) for an uploaded filename"""
+    return next(
+        ((fn, tag) for pat, fn, tag in ROUTER if fn and pat.search(filename)),
+        # fallback to generic parser module if present, otherwise inline
+        (PARSERS.get("generic") or inline_generic_convert, "Generic"),
+    )
+
+
+# ---------------------------
+# Upload helpers
+# ---------------------------
+def sniff_delimiter(raw):
+    """Guess the CSV separator from the header line, defaulting to a comma"""
+    header = raw[: raw.find(b"\n") + 1 or None].decode("latin-1")
+    try:
+        return csv.Sniffer().sniff(header, delimiters=",;\t|").delimiter
+    except csv.Error:
+        return ","
+
+
+def iter_arrow_csv(stream, delimiter=","):
+    """
+    Yield a CSV stream as string-typed DataFrames, one per pyarrow block.
+    Rows keep a running index like pandas' own chunked reader.
+    """
+    header = stream.readline().decode("utf-8-sig")
+    names = next(csv.reader([header], delimiter=delimiter), [])
+    stream.seek(0)
+
+    reader = pa_csv.open_csv(
+        stream,
+        read_options=pa_csv.ReadOptions(block_size=CSV_BLOCK_SIZE),
+        parse_options=pa_csv.ParseOptions(delimiter=delimiter),
+        convert_options=pa_csv.ConvertOptions(
+            column_types={name: pa.string() for name in names},
+            strings_can_be_null=True,
+        ),
+    )
+    start = 0
+    for batch in reader:
+        df = batch.to_pandas()
+        df.index += start
+        start += len(df)
+        yield df
+
+
+class UploadReadError(Exception):
+    """The upload could not be read with the current reader options"""
+
+
+def iter_upload(raw, ext, csv_opts=None):
+    """
+    Yield an uploaded file's bytes as DataFrames.
+    CSVs are read as strings in chunks (pyarrow blocks when available,
+    else CSV_CHUNK_ROWS rows). csv_opts, when given, are pd.read_csv
+    options and bypass the pyarrow reader.
+    """
+    stream = io.BytesIO(raw)
+    if ext != ".csv":
+        yield pd.read_excel(stream, engine=EXCEL_ENGINE)
+    elif csv_opts is None and pa_csv is not None:
+        yield from iter_arrow_csv(stream, sniff_delimiter(raw))
+    else:
+        csv_opts = {"sep": sniff_delimiter(raw), **(csv_opts or CSV_READ_OPTS)}
+        yield from pd.read_csv(stream, chunksize=CSV_CHUNK_ROWS, dtype=str, **csv_opts)
+
+
+def csv_fallbacks(ext):
+    """
+    CSV_FALLBACKS as they apply to an upload with extension ext.
+    - .xls/.xlsx files keep a strict utf-8 decode: latin-1 accepts any
+      bytes and would turn a broken or mislabeled file into junk rows
+    - CSV_READ_OPTS is skipped when it was the first read already
+    """
+    tries = []
+    for opts in CSV_FALLBACKS:
+        if ext != ".csv":
+            opts = {**opts, "encoding": "utf-8"}
+        elif pa_csv is None and opts == CSV_READ_OPTS:
+            continue
+        if opts not in tries:
+            tries.append(opts)
+    return tries
+
+
+def read_and_convert(raw, ext, parser_fn, seller_state, csv_opts=None):
+    """
+    Read an uploaded file's bytes and run parser_fn over it chunk by
+    chunk, so peak memory follows the chunk, not the file.
+    Reader failures are raised as UploadReadError; errors from parser_fn
+    propagate unchanged.
+    Return the combined Tally DataFrame, or None if the file had no rows.
+    """
+    chunks = iter_upload(raw, ext, csv_opts)
+    out_parts = []
+    while True:
         try:
-            rate = float(rate)
-        except Exception:
-            rate = None
-        amount = (
-            row.get("taxable value")
-            or row.get("amount")
-            or row.get("item value")
-            or 0.0
-        )
+            df = next(chunks, None)
+        except Exception as e:
+            raise UploadReadError(e) from e
+        if df is None:
+            break
+        # every parser takes (df, seller_state)
+        out_parts.append(parser_fn(df, seller_state))
+
+    if not out_parts:
+        return None
+    return pd.concat(out_parts, ignore_index=True)
+
+
+def convert_upload(raw, filename, seller_state):
+    """
+    Convert one uploaded file (runs in a worker thread, so no flash/request
+    access here). Raises UploadReadError if no reader can read the file.
+    """
+    ext = os.path.splitext(filename)[1].lower()
+    # choose parser by filename hint or fallback
+    parser_fn, source_tag = route_parser(filename)
+
+    if CONVERTER_ENGINE == "polars" and pl is not None and ext == ".csv":
         try:
-            amount = float(amount)
-        except Exception:
-            # fallback compute
-            try:
-                amount = float(qty) * float(rate) if rate is not None else 0.0
-            except Exception:
-                amount = 0.0
-
-        tax_amt = (
-            row.get("tax amount") or row.get("tax") or row.get("gst amount") or None
-        )
+            df = pl.read_csv(
+                io.BytesIO(raw), separator=sniff_delimiter(raw), infer_schema=False
+            )
+            # back to pandas only at the Excel-writing boundary
+            return parser_fn(df, seller_state).to_pandas()
+        except Exception as e:
+            app.logger.info(f"Polars engine failed for {filename}: {e}")
+
+    try:
+        return read_and_convert(raw, ext, parser_fn, seller_state)
+    except UploadReadError as e:
+        error = e
+
+    # try alternative reads for messy CSVs (or CSVs saved as .xls):
+    # the fast C engine first, the slow sniffing python engine last.
+    # Only read failures are retried; converter errors surface at once.
+    for opts in csv_fallbacks(ext):
         try:
-            tax_amt = float(tax_amt) if tax_amt not in (None, "") else None
-        except Exception:
-            tax_amt = None
-
-        if not tax_amt:
-            tax_amt = round(amount * 0.18, 2)
-
-        cgst, sgst, igst = apply_gst_split(tax_amt, seller_state, buyer_state)
-        total_amount = round(amount + tax_amt, 2)
-
-        r = {
-            "Voucher No": voucher_no,
-            "Voucher Date": voucher_date,
-            "Customer Name": buyer_name,
-            "Group": "Sundry Debtors",
-            "Address": buyer_state,
-            "State": buyer_state,
-            "GST Type": gst_type,
-            "GST Number": gst_number if is_b2b else "",
-            "Sales Ledger Name": "Sales through Ecommerce",
-            "Item Name": item_name,
-            "Batch No.": "",
-            "Expiry": "",
-            "HSN Code": hsn,
-            "Quantity": qty,
-            "Rate": rate if rate is not None else "",
-            "Amount": amount,
-            "Taxes": tax_amt,
-            "CGST Ledger Name": "Output CGST",
-            "CGST Amount": cgst,
-            "SGST Ledger Name": "Output SGST",
-            "SGST Amount": sgst,
-            "IGST Ledger Name": "Output IGST",
-            "IGST Amount": igst,
-            "Total Amount": total_amount,
-            "Other Charges Ledger": "",
-            "Other Charges Amount": "",
-        }
-        rows.append(r)
-
-    df_out = pd.DataFrame(
-        rows,
-        columns=__import__("converters.base", fromlist=["TALLY_COLUMNS"]).TALLY_COLUMNS,
-    )
-    return df_out
+            return read_and_convert(raw, ".csv", parser_fn, seller_state, opts)
+        except UploadReadError as e:
+            error = e
+    raise error
+
+
+def write_workbook(output, sheets):
+    """
+    Write {sheet name: DataFrame} to an xlsx file or buffer.
+    Uses xlsxwriter in constant_memory mode, which flushes each row
+    as soon as the next one starts; rows are therefore written strictly
+    in order (pandas' to_excel writes column by column and would lose
+    cells in this mode).
+    """
+    workbook = xlsxwriter.Workbook(output, {"constant_memory": True})
+    header_fmt = workbook.add_format({"bold": True})
+    for name, df in sheets.items():
+        sheet = workbook.add_worksheet(name)
+        sheet.write_row(0, 0, [str(c) for c in df.columns], header_fmt)
+        data = df.astype(object).where(df.notna(), None)
+        for r, row in enumerate(data.itertuples(index=False, name=None), start=1):
+            sheet.write_row(r, 0, row)
+    workbook.close()
 
 
 # ---------------------------
@@ -208,11 +329,12 @@ def index():
             parsed_dfs = []
             parsed_sources = []
 
+            # read bytes up front so workers never share a request stream
+            uploads = []
             for file in files:
                 if file.filename == "":
                     continue
 
-                fn_lower = file.filename.lower()
                 ext = os.path.splitext(file.filename)[1].lower()
                 if ext not in UPLOAD_EXTENSIONS:
                     flash(
@@ -221,57 +343,33 @@ def index():
                     )
                     continue
 
-                # read file safely
-                try:
-                    file.stream.seek(0)
-                    if ext == ".csv":
-                        # try common encodings and separators; best-effort
-                        df = pd.read_csv(file, low_memory=False)
-                    else:
-                        df = pd.read_excel(file)
-                except Exception as e:
-                    # try alternative read for messy CSVs
+                uploads.append((file.read(), file.filename))
+
+            # parsing is mostly pandas/pyarrow C code that releases the GIL
+            workers = min(MAX_UPLOAD_WORKERS, len(uploads)) or 1
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                futures = [
+                    pool.submit(convert_upload, raw, filename, seller_state)
+                    for raw, filename in uploads
+                ]
+
+                for (_, filename), future in zip(uploads, futures):
                     try:
-                        file.stream.seek(0)
-                        df = pd.read_csv(
-                            file, encoding="utf-8", engine="python", low_memory=False
-                        )
+                        out_df = future.result()
+                    except UploadReadError as e2:
+                        app.logger.error(f"Failed to read {filename}: {e2}")
+                        flash(f"Failed to read {filename}: {e2}", "danger")
+                        continue
                     except Exception as e2:
-                        app.logger.error(f"Failed to read {file.filename}: {e2}")
-                        flash(f"Failed to read {file.filename}: {e2}", "danger")
+                        app.logger.exception(f"Failed to convert {filename}: {e2}")
+                        flash(f"Failed to convert {filename}: {e2}", "danger")
                         continue
 
-                # choose parser by filename hint or fallback
-                parser_fn = None
-                if "amazon" in fn_lower and PARSERS.get("amazon"):
-                    parser_fn = PARSERS["amazon"]
-                    source_tag = "Amazon"
-                elif "flipkart" in fn_lower and PARSERS.get("flipkart"):
-                    parser_fn = PARSERS["flipkart"]
-                    source_tag = "Flipkart"
-                elif "meesho" in fn_lower and PARSERS.get("meesho"):
-                    parser_fn = PARSERS["meesho"]
-                    source_tag = "Meesho"
-                elif "tcs" in fn_lower and PARSERS.get("tcs"):
-                    parser_fn = PARSERS["tcs"]
-                    source_tag = "TCS"
-                else:
-                    # fallback to generic parser module if present, otherwise inline
-                    parser_fn = PARSERS.get("generic") or inline_generic_convert
-                    source_tag = "Generic"
-
-                # ensure parser signature is df, seller_state
-                try:
-                    out_df = parser_fn(df, seller_state)
-                except TypeError:
-                    # some parsers might expect (df, seller_state)
-                    out_df = parser_fn(df, seller_state)
-
-                if out_df is None or out_df.empty:
-                    app.logger.info(f"Parser returned no rows for {file.filename}")
-                else:
-                    parsed_dfs.append(out_df)
-                    parsed_sources.append(file.filename)
+                    if out_df is None or out_df.empty:
+                        app.logger.info(f"Parser returned no rows for {filename}")
+                    else:
+                        parsed_dfs.append(out_df)
+                        parsed_sources.append(filename)
 
             if not parsed_dfs:
                 flash(
@@ -289,19 +387,22 @@ def index():
             meta = pd.DataFrame(
                 {
                     "Generated On": [
-                        datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S UTC")
+                        datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S UTC")
                     ],
                     "Source Files": [", ".join(parsed_sources)],
                     "Seller State": [seller_state],
                 }
             )
 
-            # write to in-memory excel
-            output = io.BytesIO()
-            with pd.ExcelWriter(output, engine="openpyxl") as writer:
-                combined.to_excel(writer, sheet_name="Sales", index=False)
-                sales_return.to_excel(writer, sheet_name="Sales Return", index=False)
-                meta.to_excel(writer, sheet_name="_metadata", index=False)
+            # write the workbook to a temp file that spills to disk past
+            # OUTPUT_SPOOL_SIZE, so send_file can stream it back
+            output = tempfile.SpooledTemporaryFile(
+                max_size=OUTPUT_SPOOL_SIZE, suffix=".xlsx"
+            )
+            write_workbook(
+                output,
+                {"Sales": combined, "Sales Return": sales_return, "_metadata": meta},
+            )
             output.seek(0)
 
             fname = f"tally_vouchers_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
@@ -313,11 +414,7 @@ def index():
             )
 
         except Exception as e:
-            app.logger.error(
-                "Unhandled exception in upload/convert: %s\n%s",
-                e,
-                traceback.format_exc(),
-            )
+            app.logger.exception("Unhandled exception in upload/convert: %s", e)
             flash(f"An error occurred during conversion: {e}", "danger")
             return redirect(url_for("index"))
 
@@ -330,7 +427,7 @@ def index():
 # ---------------------------
 @app.route("/healthz")
 def healthz():
-    return {"status": "ok", "time": datetime.utcnow().isoformat()}
+    return {"status": "ok", "time": datetime.now(timezone.utc).isoformat()}
 
 
 # ---------------------------
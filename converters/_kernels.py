@@ -0,0 +1,93 @@
+"""
+Numeric kernels shared by the converters (amount / tax / GST split)
+"""
+
+import threading
+
+import numpy as np
+
+try:
+    from numba import config, njit, prange
+
+    # TBB hangs interpreter shutdown once a kernel ran on a worker thread;
+    # omp/workqueue are safe given the _JIT_LOCK below
+    config.THREADING_LAYER_PRIORITY = ["omp", "workqueue", "tbb"]
+except ImportError:
+    njit = None
+
+# only flags that keep results bit-identical to the NumPy version: no "nnan"
+# (the fallbacks rely on NaN checks) and no reassoc/arcp/contract, which
+# change np.round(x, 2) results in the money columns
+FASTMATH = {"nsz"}
+
+# numba's default workqueue threading layer aborts the process when a
+# parallel kernel is launched from several threads at once (uploads are
+# converted in a thread pool); the kernel is already parallel inside
+_JIT_LOCK = threading.Lock()
+
+
+def _compute_tally_np(qty, rate, taxable, tax_in, intra):
+    """NumPy version of compute_tally, used when numba is unavailable"""
+    amount = np.where(np.isnan(taxable), rate * qty, taxable)
+    tax_amt = np.where(np.isnan(tax_in), amount * 0.18, tax_in)
+
+    half = np.round(tax_amt / 2, 2)
+    cgst = np.where(intra, half, 0.0)
+    sgst = np.where(intra, half, 0.0)
+    igst = np.where(intra, 0.0, np.round(tax_amt, 2))
+    total = np.round(amount + tax_amt, 2)
+
+    return amount, tax_amt, cgst, sgst, igst, total
+
+
+if njit is not None:
+
+    @njit(parallel=True, cache=True, fastmath=FASTMATH)
+    def _compute_tally_jit(qty, rate, taxable, tax_in, intra):
+        n = qty.shape[0]
+        amount = np.empty(n)
+        tax_amt = np.empty(n)
+        cgst = np.zeros(n)
+        sgst = np.zeros(n)
+        igst = np.zeros(n)
+        total = np.empty(n)
+
+        for i in prange(n):
+            a = taxable[i]
+            if np.isnan(a):
+                a = rate[i] * qty[i]
+            t = tax_in[i]
+            if np.isnan(t):
+                t = a * 0.18
+
+            amount[i] = a
+            tax_amt[i] = t
+            if intra[i]:
+                half = np.round(t / 2, 2)
+                cgst[i] = half
+                sgst[i] = half
+            else:
+                igst[i] = np.round(t, 2)
+            total[i] = np.round(a + t, 2)
+
+        return amount, tax_amt, cgst, sgst, igst, total
+
+
+def compute_tally(qty, rate, taxable, tax_in, intra):
+    """
+    Fill in missing amounts/taxes and split GST in one pass.
+    - amount falls back to rate * qty where taxable is NaN
+    - tax falls back to 18% of amount where tax_in is NaN
+    - intra-state rows get CGST + SGST, others IGST
+    Returns (amount, tax_amt, cgst, sgst, igst, total) float arrays.
+    """
+    qty = np.ascontiguousarray(qty, dtype=np.float64)
+    rate = np.ascontiguousarray(rate, dtype=np.float64)
+    taxable = np.ascontiguousarray(taxable, dtype=np.float64)
+    tax_in = np.ascontiguousarray(tax_in, dtype=np.float64)
+    intra = np.ascontiguousarray(intra, dtype=np.bool_)
+
+    if njit is not None:
+        with _JIT_LOCK:
+            return _compute_tally_jit(qty, rate, taxable, tax_in, intra)
+    return _compute_tally_np(qty, rate, taxable, tax_in, intra)
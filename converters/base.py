@@ -2,8 +2,10 @@
 Shared base utilities for all e-commerce → Tally converters
 """
 
+import numpy as np
 import pandas as pd
-from dateutil import parser as dateparser
+
+from ._kernels import compute_tally
 
 # ----------------------------
 # Tally output schema
@@ -38,48 +40,163 @@ TALLY_COLUMNS = [
 ]
 
 
+GST_TYPES = ["Registered", "Unregistered"]
+DATE_FORMAT = "%Y-%m-%d"
+
+# GST state codes (first two digits of a GSTIN), keyed by normalised name
+STATE_TO_CODE = {
+    "jammu and kashmir": "01",
+    "himachal pradesh": "02",
+    "punjab": "03",
+    "chandigarh": "04",
+    "uttarakhand": "05",
+    "uttaranchal": "05",
+    "haryana": "06",
+    "delhi": "07",
+    "new delhi": "07",
+    "rajasthan": "08",
+    "uttar pradesh": "09",
+    "bihar": "10",
+    "sikkim": "11",
+    "arunachal pradesh": "12",
+    "nagaland": "13",
+    "manipur": "14",
+    "mizoram": "15",
+    "tripura": "16",
+    "meghalaya": "17",
+    "assam": "18",
+    "west bengal": "19",
+    "jharkhand": "20",
+    "odisha": "21",
+    "orissa": "21",
+    "chhattisgarh": "22",
+    "madhya pradesh": "23",
+    "gujarat": "24",
+    "dadra and nagar haveli and daman and diu": "26",
+    "dadra and nagar haveli": "26",
+    "daman and diu": "25",
+    "maharashtra": "27",
+    "karnataka": "29",
+    "goa": "30",
+    "lakshadweep": "31",
+    "kerala": "32",
+    "tamil nadu": "33",
+    "puducherry": "34",
+    "pondicherry": "34",
+    "andaman and nicobar islands": "35",
+    "telangana": "36",
+    "andhra pradesh": "37",
+    "ladakh": "38",
+}
+# Daman & Diu (25) merged into Dadra & Nagar Haveli (26) in 2020; GSTINs
+# issued before then still start with 25
+SAME_STATE_CODES = {"25": "26"}
+GSTIN_PATTERN = r"^\d{2}[0-9A-Z]{13}$"
+
+
 # ----------------------------
 # Helpers
 # ----------------------------
-def parse_date(val):
-    """Try to parse any date-like value into YYYY-MM-DD string"""
-    try:
-        return dateparser.parse(str(val)).strftime("%Y-%m-%d")
-    except Exception:
-        return ""
+def pick(df, names, default=None):
+    """Return the first non-empty value across candidate columns, row by row"""
+    out = None
+    for name in names:
+        if name in df.columns:
+            col = df[name].replace("", np.nan)
+            out = col if out is None else out.combine_first(col)
+    if out is None:
+        return pd.Series(default, index=df.index, dtype=object)
+    if default is not None:
+        out = out.fillna(default)
+    return out
+
+
+def resolve_schema(columns, schema):
+    """Map each logical field to the alias columns actually present"""
+    present = set(columns)
+    return {key: [c for c in names if c in present] for key, names in schema.items()}
+
+
+def to_number(series, default=np.nan):
+    """Coerce a column to float, filling unparsable values with default"""
+    return pd.to_numeric(series, errors="coerce").fillna(default)
 
 
-def safe_float(x, default=0.0):
-    """Convert to float if possible, otherwise return default"""
+def _parse_day_first(val):
+    """Parse one date-like string day-first, or None if it can't be parsed"""
     try:
-        return float(x)
-    except Exception:
-        return default
+        return pd.to_datetime(val, dayfirst=True).strftime(DATE_FORMAT)
+    except (TypeError, ValueError):
+        return None
 
 
-def apply_gst_split(tax_amount, seller_state, buyer_state):
+def to_date(series):
+    """Parse a column of date-like values into YYYY-MM-DD strings"""
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series.dt.strftime(DATE_FORMAT).fillna("")
+
+    text = series.dropna().astype(str).str.strip()
+    # ISO values parse in one strict pass on their date part, so a time or
+    # UTC offset never shifts the local date; only the leftovers go day-first
+    dates = pd.to_datetime(text.str[:10], errors="coerce", format="%Y-%m-%d")
+    out = dates.dt.strftime(DATE_FORMAT)
+    missed = dates.isna()
+    if missed.any():
+        try:
+            rest = pd.to_datetime(
+                text[missed], errors="coerce", dayfirst=True, format="mixed"
+            ).dt.strftime(DATE_FORMAT)
+        except (TypeError, ValueError):
+            # e.g. mixed UTC offsets: parse value by value
+            rest = text[missed].map(_parse_day_first)
+        out = out.combine_first(rest)
+    return out.reindex(series.index).fillna("")
+
+
+def normalize_states(states):
+    """Lowercase, trim and unify '&' / spacing in a Series of state names"""
+    return (
+        states.astype(str)
+        .str.strip()
+        .str.lower()
+        .str.replace("&", " and ", regex=False)
+        .str.replace(r"\s+", " ", regex=True)
+    )
+
+
+def intra_state(seller_state, buyer_states, gst_numbers=None):
     """
-    Decide GST breakup based on intra/inter state
-    - If same state: CGST + SGST (9% + 9%)
-    - If different state: IGST (18%)
+    Boolean array: True where the buyer is in the seller's state.
+    States are compared by GST state code, so spelling/case variants
+    match; a buyer whose state name is missing or unknown falls back to
+    the code in its GSTIN, and then to a plain name comparison.
     """
-    seller_state = str(seller_state).strip().lower()
-    buyer_state = str(buyer_state).strip().lower()
+    ss = normalize_states(pd.Series([seller_state])).iloc[0]
+    bs = normalize_states(buyer_states)
+    by_name = ((bs == ss) & (bs != "")).to_numpy()
+
+    seller_code = STATE_TO_CODE.get(ss)
+    if seller_code is None:
+        return by_name
+    seller_code = SAME_STATE_CODES.get(seller_code, seller_code)
 
-    intra = seller_state and buyer_state and seller_state == buyer_state
+    buyer_code = bs.map(STATE_TO_CODE)
+    if gst_numbers is not None:
+        gstin = gst_numbers.astype(str).str.strip().str.upper()
+        from_gstin = gstin.str[:2].where(gstin.str.match(GSTIN_PATTERN))
+        buyer_code = buyer_code.fillna(from_gstin)
+    buyer_code = buyer_code.replace(SAME_STATE_CODES)
 
-    if intra:
-        cgst = round(tax_amount / 2, 2)
-        sgst = round(tax_amount / 2, 2)
-        igst = 0.0
-    else:
-        cgst = sgst = 0.0
-        igst = round(tax_amount, 2)
+    known = buyer_code.notna().to_numpy()
+    return np.where(known, (buyer_code == seller_code).to_numpy(), by_name)
 
-    return cgst, sgst, igst
 
+def constant_column(value, n):
+    """A length-n categorical holding one repeated value (1 byte per row)"""
+    return pd.Categorical.from_codes(np.zeros(n, dtype=np.int8), categories=[value])
 
-def make_row(
+
+def make_frame(
     voucher_no,
     voucher_date,
     customer,
@@ -95,89 +212,153 @@ def make_row(
     cgst,
     sgst,
     igst,
+    total,
 ):
-    """Return one row dictionary in the Tally schema"""
-    return {
+    """Return a Tally schema DataFrame built from whole columns"""
+    n = len(qty)
+    # repeated ledger names, states and GST types are stored as categoricals
+    state = pd.Categorical(state)
+    blank = constant_column("", n)
+    out = {
         "Voucher No": voucher_no,
         "Voucher Date": voucher_date,
         "Customer Name": customer,
-        "Group": "Sundry Debtors",
+        "Group": constant_column("Sundry Debtors", n),
         "Address": state,
         "State": state,
-        "GST Type": gst_type,
+        "GST Type": pd.Categorical(gst_type, categories=GST_TYPES),
         "GST Number": gst_number,
-        "Sales Ledger Name": "Sales through Ecommerce",
+        "Sales Ledger Name": constant_column("Sales through Ecommerce", n),
         "Item Name": item_name,
-        "Batch No.": "",
-        "Expiry": "",
+        "Batch No.": blank,
+        "Expiry": blank,
         "HSN Code": hsn,
         "Quantity": qty,
         "Rate": rate,
         "Amount": amount,
         "Taxes": tax_amt,
-        "CGST Ledger Name": "Output CGST",
+        "CGST Ledger Name": constant_column("Output CGST", n),
         "CGST Amount": cgst,
-        "SGST Ledger Name": "Output SGST",
+        "SGST Ledger Name": constant_column("Output SGST", n),
         "SGST Amount": sgst,
-        "IGST Ledger Name": "Output IGST",
+        "IGST Ledger Name": constant_column("Output IGST", n),
         "IGST Amount": igst,
-        "Total Amount": round(amount + tax_amt, 2),
-        "Other Charges Ledger": "",
-        "Other Charges Amount": "",
+        "Total Amount": total,
+        "Other Charges Ledger": blank,
+        "Other Charges Amount": blank,
+    }
+    # hand pandas plain arrays in schema order: no index alignment,
+    # no column reindex and no defensive copy of every column
+    data = {
+        col: out[col].array if isinstance(out[col], pd.Series) else out[col]
+        for col in TALLY_COLUMNS
     }
+    return pd.DataFrame(data, index=qty.index, copy=False)
+
+
+# ----------------------------
+# Table-driven converter
+# ----------------------------
+def convert_vectorized(
+    df: pd.DataFrame,
+    seller_state: str,
+    schema: dict,
+    prefix: str,
+    customer: str = "Sale through Ecommerce",
+) -> pd.DataFrame:
+    """
+    Map a marketplace report into the Tally schema.
+    `schema` lists the candidate source columns for each logical field,
+    `prefix` seeds fallback voucher numbers (separator included, e.g.
+    "AMZ-") and `customer` is the default buyer name.
+    A polars DataFrame is handed to the polars engine instead.
+    """
+    if not isinstance(df, pd.DataFrame):
+        from .polars_engine import convert
+
+        return convert(df, seller_state, schema, prefix, customer)
+
+    # normalize column names in one Index op; set_axis leaves the caller's
+    # frame untouched without copying the data
+    df = df.set_axis(df.columns.astype(str).str.strip().str.lower(), axis=1)
+
+    # resolve aliases against the header once, not per field lookup
+    resolved = resolve_schema(df.columns, schema)
+
+    def field(key, default=None):
+        return pick(df, resolved.get(key, []), default)
+
+    voucher_no = field("voucher_no")
+    missing = voucher_no.isna().to_numpy()
+    if missing.any():
+        # numbered fallback (by row label, so it keeps counting across
+        # chunks), built only for the rows that lack an ID
+        labels = df.index[missing]
+        fallback_no = pd.Series(labels + 1, index=labels).astype(str).radd(prefix)
+        voucher_no = voucher_no.fillna(fallback_no)
+    voucher_date = to_date(field("voucher_date"))
+
+    buyer_state = field("buyer_state", "")
+    buyer_name = field("buyer_name", customer)
+
+    gst_number = field("gst_number", "")
+    gst_type = np.where(gst_number != "", "Registered", "Unregistered")
+
+    item = field("item", "Item")
+    hsn = field("hsn", "")
+    qty = to_number(field("qty"), 1.0)
+    rate = to_number(field("rate"), 0.0)
+    amount, tax_amt, cgst, sgst, igst, total = compute_tally(
+        qty.to_numpy(),
+        rate.to_numpy(),
+        to_number(field("amount")).to_numpy(),
+        to_number(field("tax")).to_numpy(),
+        intra_state(seller_state, buyer_state, gst_number),
+    )
+
+    return make_frame(
+        voucher_no,
+        voucher_date,
+        buyer_name,
+        buyer_state,
+        gst_type,
+        gst_number,
+        item,
+        hsn,
+        qty,
+        rate,
+        amount,
+        tax_amt,
+        cgst,
+        sgst,
+        igst,
+        total,
+    )
 
 
 # ----------------------------
 # Generic fallback converter
 # ----------------------------
+GENERIC_SCHEMA = {
+    "voucher_no": ["invoice id", "order id"],
+    "voucher_date": ["invoice date", "order date"],
+    "buyer_state": ["shipping state", "state"],
+    "buyer_name": ["buyer name", "customer name"],
+    "gst_number": ["buyer gstin", "gstin"],
+    "item": ["product name", "item name"],
+    "hsn": ["hsn"],
+    "qty": ["quantity"],
+    "rate": ["unit price", "price"],
+    "amount": ["taxable value", "amount"],
+    "tax": ["tax amount", "gst amount"],
+}
+
+
 def generic_convert(df: pd.DataFrame, seller_state: str) -> pd.DataFrame:
     """
     A basic converter that tries to map common columns
     from unknown marketplace formats into Tally schema.
     """
-    colmap = {c: c.strip().lower() for c in df.columns}
-    df = df.rename(columns=colmap)
-    rows = []
-
-    for idx, r in df.iterrows():
-        voucher_no = r.get("invoice id") or r.get("order id") or f"GEN-{idx+1}"
-        voucher_date = parse_date(r.get("invoice date") or r.get("order date") or "")
-        buyer_state = r.get("shipping state") or r.get("state") or ""
-        buyer_name = (
-            r.get("buyer name") or r.get("customer name") or "Sale through Generic"
-        )
-        gst_number = r.get("buyer gstin") or r.get("gstin") or ""
-        gst_type = "Registered" if gst_number else "Unregistered"
-
-        item = r.get("product name") or r.get("item name") or "Item"
-        hsn = r.get("hsn") or ""
-        qty = safe_float(r.get("quantity") or 1, 1)
-        rate = safe_float(r.get("unit price") or r.get("price") or 0)
-        amount = safe_float(r.get("taxable value") or r.get("amount") or rate * qty, 0)
-        tax_amt = safe_float(
-            r.get("tax amount") or r.get("gst amount") or amount * 0.18, 0
-        )
-
-        cgst, sgst, igst = apply_gst_split(tax_amt, seller_state, buyer_state)
-
-        rows.append(
-            make_row(
-                voucher_no,
-                voucher_date,
-                buyer_name,
-                buyer_state,
-                gst_type,
-                gst_number,
-                item,
-                hsn,
-                qty,
-                rate,
-                amount,
-                tax_amt,
-                cgst,
-                sgst,
-                igst,
-            )
-        )
-
-    return pd.DataFrame(rows, columns=TALLY_COLUMNS)
+    return convert_vectorized(
+        df, seller_state, GENERIC_SCHEMA, "GEN-", "Sale through Generic"
+    )
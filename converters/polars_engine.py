@@ -0,0 +1,165 @@
+"""
+Polars implementation of the table-driven converter
+(enabled in the app with CONVERTER_ENGINE=polars)
+"""
+
+import polars as pl
+import pandas as pd
+
+from .base import (
+    TALLY_COLUMNS,
+    STATE_TO_CODE,
+    SAME_STATE_CODES,
+    GSTIN_PATTERN,
+    DATE_FORMAT,
+    normalize_states,
+    to_date,
+)
+
+# Input date layouts tried in order, on the whole value and on its date part
+# (before any time); ISO first, then day-first Indian styles. Values none of
+# them match are handed to base.to_date.
+DATE_FORMATS = [
+    "%Y-%m-%d",
+    "%Y/%m/%d",
+    "%d/%m/%Y",
+    "%d-%m-%Y",
+    "%d.%m.%Y",
+    "%d-%b-%Y",
+    "%d %b %Y",
+    "%b %d, %Y",
+]
+
+
+def _normalize_states(expr):
+    """Polars twin of base.normalize_states"""
+    return (
+        expr.str.strip_chars()
+        .str.to_lowercase()
+        .str.replace_all("&", " and ", literal=True)
+        .str.replace_all(r"\s+", " ")
+    )
+
+
+def convert(
+    df: pl.DataFrame,
+    seller_state: str,
+    schema: dict,
+    prefix: str,
+    customer: str = "Sale through Ecommerce",
+) -> pl.DataFrame:
+    """
+    Map a marketplace report (read with every column as string) into the
+    Tally schema; same rules as base.convert_vectorized, as one lazy
+    polars query.
+    """
+    df = df.rename({c: str(c).strip().lower() for c in df.columns})
+    present = set(df.columns)
+
+    def field(key, default=None):
+        cols = [
+            pl.when(pl.col(c).cast(pl.String) != "").then(pl.col(c).cast(pl.String))
+            for c in schema.get(key, [])
+            if c in present
+        ]
+        if default is not None:
+            cols.append(pl.lit(default))
+        if not cols:
+            return pl.lit(None, dtype=pl.String)
+        return pl.coalesce(cols)
+
+    def number(key, default=None):
+        value = field(key).str.strip_chars().cast(pl.Float64, strict=False)
+        return value if default is None else value.fill_null(default)
+
+    # Voucher details
+    row_no = pl.int_range(1, pl.len() + 1).cast(pl.String)
+    voucher_no = pl.coalesce(
+        [field("voucher_no"), pl.concat_str([pl.lit(prefix), row_no])]
+    )
+    raw_date = field("voucher_date").str.strip_chars()
+    date_part = raw_date.str.extract(r"^([^\sT]+)")
+    voucher_date = (
+        pl.coalesce(
+            [
+                value.str.to_date(fmt, strict=False)
+                for value in (date_part, raw_date)
+                for fmt in DATE_FORMATS
+            ]
+        )
+        .dt.strftime(DATE_FORMAT)
+        .fill_null("")
+    )
+
+    # Buyer / GST info
+    buyer_state = field("buyer_state", "")
+    gst_number = field("gst_number", "")
+
+    # Intra-state check by GST state code (see base.intra_state)
+    ss = normalize_states(pd.Series([seller_state])).iloc[0]
+    bs = _normalize_states(buyer_state)
+    by_name = (bs == ss) & (bs != "")
+    seller_code = STATE_TO_CODE.get(ss)
+    if seller_code is None:
+        intra = by_name
+    else:
+        seller_code = SAME_STATE_CODES.get(seller_code, seller_code)
+        gstin = gst_number.str.strip_chars().str.to_uppercase()
+        buyer_code = pl.coalesce(
+            [
+                bs.replace_strict(STATE_TO_CODE, default=None, return_dtype=pl.String),
+                pl.when(gstin.str.contains(GSTIN_PATTERN)).then(gstin.str.slice(0, 2)),
+            ]
+        ).replace(SAME_STATE_CODES)
+        intra = (
+            pl.when(buyer_code.is_not_null())
+            .then(buyer_code == seller_code)
+            .otherwise(by_name)
+        )
+
+    # Amounts and GST split
+    qty = number("qty", 1.0)
+    rate = number("rate", 0.0)
+    amount = pl.coalesce([number("amount"), rate * qty])
+    tax_amt = pl.coalesce([number("tax"), amount * 0.18])
+    half = (tax_amt / 2).round(2)
+
+    out = {
+        "Voucher No": voucher_no,
+        "Voucher Date": voucher_date,
+        "Customer Name": field("buyer_name", customer),
+        "Group": pl.lit("Sundry Debtors"),
+        "Address": buyer_state,
+        "State": buyer_state,
+        "GST Type": pl.when(gst_number != "")
+        .then(pl.lit("Registered"))
+        .otherwise(pl.lit("Unregistered")),
+        "GST Number": gst_number,
+        "Sales Ledger Name": pl.lit("Sales through Ecommerce"),
+        "Item Name": field("item", "Item"),
+        "Batch No.": pl.lit(""),
+        "Expiry": pl.lit(""),
+        "HSN Code": field("hsn", ""),
+        "Quantity": qty,
+        "Rate": rate,
+        "Amount": amount,
+        "Taxes": tax_amt,
+        "CGST Ledger Name": pl.lit("Output CGST"),
+        "CGST Amount": pl.when(intra).then(half).otherwise(0.0),
+        "SGST Ledger Name": pl.lit("Output SGST"),
+        "SGST Amount": pl.when(intra).then(half).otherwise(0.0),
+        "IGST Ledger Name": pl.lit("Output IGST"),
+        "IGST Amount": pl.when(intra).then(0.0).otherwise(tax_amt.round(2)),
+        "Total Amount": (amount + tax_amt).round(2),
+        "Other Charges Ledger": pl.lit(""),
+        "Other Charges Amount": pl.lit(""),
+    }
+    exprs = [out[col].alias(col) for col in TALLY_COLUMNS]
+    result = df.lazy().select(exprs + [raw_date.alias("_raw_date")]).collect()
+
+    # dates in a layout DATE_FORMATS doesn't cover go through pandas
+    missed = (pl.col("Voucher Date") == "") & (pl.col("_raw_date") != "")
+    if result.select(missed.any()).item():
+        fixed = to_date(pd.Series(result["_raw_date"].to_list(), dtype=object))
+        result = result.with_columns(pl.Series("Voucher Date", fixed.tolist()))
+    return result.drop("_raw_date")
@@ -0,0 +1,21 @@
+import pandas as pd
+import pytest
+
+import app
+
+PDF = b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n1 0 obj\n<< /Type /Catalog >>\nendobj\n%%EOF\n"
+
+
+def test_mislabeled_excel_upload_fails_to_read():
+    with pytest.raises(app.UploadReadError):
+        app.convert_upload(PDF, "meesho_x.xlsx", "Delhi")
+
+
+def test_csv_fallbacks_skip_repeat_of_first_read(monkeypatch):
+    monkeypatch.setattr(app, "pa_csv", None)
+    assert app.CSV_READ_OPTS not in app.csv_fallbacks(".csv")
+
+
+def test_inline_fallback_voucher_numbers():
+    out = app.inline_generic_convert(pd.DataFrame({"price": ["10", "20"]}), "Delhi")
+    assert out["Voucher No"].tolist() == ["R1", "R2"]
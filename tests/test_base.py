@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+
+from converters import _kernels
+from converters._kernels import compute_tally
+from converters.base import intra_state, to_date
+
+
+def test_to_date_mixed_iso_offset_and_day_first():
+    dates = pd.Series(["2024-01-02T10:00:00+05:30", "05/01/2024"], dtype=object)
+    assert to_date(dates).tolist() == ["2024-01-02", "2024-01-05"]
+
+
+def test_to_date_mixed_utc_offsets():
+    dates = pd.Series(["2024-01-02T10:00:00+05:30", "2024-01-03T01:00:00Z"])
+    assert to_date(dates).tolist() == ["2024-01-02", "2024-01-03"]
+
+
+def test_to_date_non_iso_mixed_offsets():
+    dates = pd.Series(["15/01/2024 10:30:00+05:30", "Jan 5 2024 10:00Z", None, "bad"])
+    assert to_date(dates).tolist() == ["2024-01-15", "2024-01-05", "", ""]
+
+
+def test_to_date_numeric_column_does_not_raise():
+    assert to_date(pd.Series([45000.0, None])).tolist() == ["", ""]
+
+
+def test_compute_tally_jit_matches_numpy():
+    rng = np.random.default_rng(0)
+    n = 200_000
+    qty = rng.integers(1, 5, n).astype(float)
+    rate = rng.random(n) * 1000
+    taxable = np.where(rng.random(n) < 0.3, np.nan, rng.random(n) * 900)
+    tax_in = np.where(rng.random(n) < 0.3, np.nan, rng.random(n) * 100)
+    intra = rng.random(n) < 0.5
+
+    jit = compute_tally(qty, rate, taxable, tax_in, intra)
+    ref = _kernels._compute_tally_np(qty, rate, taxable, tax_in, intra)
+    for got, want in zip(jit, ref):
+        np.testing.assert_array_equal(got, want)
+
+
+def test_intra_state_daman_and_diu_codes():
+    states = pd.Series(["Daman & Diu", "", "Dadra and Nagar Haveli", "Gujarat"])
+    gstins = pd.Series(["", "25ABCDE1234F1Z5", "", ""])
+    got = intra_state("Dadra and Nagar Haveli and Daman and Diu", states, gstins)
+    assert got.tolist() == [True, True, True, False]
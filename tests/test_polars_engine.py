@@ -0,0 +1,25 @@
+import pytest
+
+from converters import amazon
+
+pl = pytest.importorskip("polars")
+
+
+def test_polars_dates_with_time_and_slashes():
+    dates = ["15/01/2024 10:30:00", "15-01-2024 10:30", "2024/01/15", "15th Jan 2024"]
+    df = pl.DataFrame({"invoice-date": dates})
+    out = amazon.convert(df, "Delhi")
+    assert out["Voucher Date"].to_list() == ["2024-01-15"] * 4
+
+
+def test_polars_daman_and_diu_gstin_is_intra_state():
+    df = pl.DataFrame(
+        {
+            "ship-state": ["", "Daman & Diu"],
+            "buyer-gstin": ["25ABCDE1234F1Z5", ""],
+            "tax-amount": ["10", "10"],
+        }
+    )
+    out = amazon.convert(df, "Dadra and Nagar Haveli")
+    assert out["CGST Amount"].to_list() == [5.0, 5.0]
+    assert out["IGST Amount"].to_list() == [0.0, 0.0]